@@ -11,29 +11,41 @@ from flask import (
 )
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import check_password_hash
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerifyMismatchError
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from lxml import etree
 from together import Together
 from openai import OpenAI
 import os
-import json
+import orjson
+from flask.json.provider import JSONProvider
 from dotenv import load_dotenv
 import logging
+from logging.handlers import QueueHandler, QueueListener
+import queue
+import atexit
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
+import redis
 from flask_cors import CORS
-import uuid
+import secrets
+import hashlib
 import re
 from datetime import datetime, timedelta
 import time
 from alembic import op
 import sqlalchemy as sa
+import functools
 from functools import wraps
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.naive_bayes import MultinomialNB
 import numpy as np
 from sqlalchemy import func
+from sqlalchemy.orm import load_only
 from apscheduler.schedulers.background import BackgroundScheduler
 from flask import jsonify, request
 import smtplib
@@ -59,17 +71,35 @@ if not openai_api_key:
 together_client = Together(api_key=together_api_key)
 openai_client = OpenAI(api_key=openai_api_key, base_url="https://api.aimlapi.com")
 
+class ORJSONProvider(JSONProvider):
+    """Flask JSON provider backed by orjson's C serializer."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=str).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 CORS(app, resources={r"/*": {"origins": "*"}})
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
+# Set up logging. Records go through a queue so handler I/O runs on a
+# background thread instead of the request path
+_log_queue = queue.Queue(-1)
+_log_listener = QueueListener(_log_queue, logging.StreamHandler())
+_log_listener.start()
+atexit.register(_log_listener.stop)
+logging.basicConfig(level=logging.INFO, handlers=[QueueHandler(_log_queue)])
 logger = logging.getLogger(__name__)
 
-# Set up rate limiting
+# Set up rate limiting, backed by Redis so limits are shared across workers
 limiter = Limiter(
     key_func=get_remote_address,
     app=app,
+    storage_uri=os.getenv("REDIS_URL", "memory://"),
+    strategy="moving-window",
     default_limits=["2000 per day", "1000 per hour"],
 )
 
@@ -78,13 +108,120 @@ app.config["SECRET_KEY"] = os.getenv(
     "SECRET_KEY", "fallback_secret_key_for_development"
 )
 app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("DATABASE_URL", "sqlite:///users.db")
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+    "pool_size": 10,
+    "max_overflow": 20,
+    "pool_timeout": 30,
+    "pool_pre_ping": True,
+    "pool_recycle": 1800,
+}
 db.init_app(app)
 migrate = Migrate(app, db)
 
+
+@app.teardown_request
+def cleanup_session(exception=None):
+    # Return connections to the pool as soon as the request finishes
+    db.session.remove()
+
+
+# Redis-backed context cache, shared across all gunicorn workers
+redis_client = redis.Redis.from_url(
+    os.getenv("REDIS_URL", "redis://localhost:6379/0"), decode_responses=True
+)
+CONTEXT_CACHE_TTL = 86400  # seconds
+
+
+def cache_extracted_text(api_key, extracted_text):
+    try:
+        redis_client.set(f"ctx:{api_key}", extracted_text, ex=CONTEXT_CACHE_TTL)
+    except redis.RedisError as e:
+        logger.warning("Could not cache context for API key %s: %s", api_key, e)
+
+
+def get_cached_extracted_text(api_key):
+    try:
+        return redis_client.get(f"ctx:{api_key}")
+    except redis.RedisError as e:
+        logger.warning("Context cache read failed for API key %s: %s", api_key, e)
+        return None
+
+
+def drop_cached_extracted_text(api_key):
+    try:
+        redis_client.delete(f"ctx:{api_key}")
+    except redis.RedisError as e:
+        logger.warning("Could not drop cached context for API key %s: %s", api_key, e)
+
+
+# Shared HTTP session for page fetches. Repeated /process_url calls on the
+# same URL are served from the extracted-text cache in extract_text_from_url;
+# the raw responses are deliberately not cached so misses can stream
+url_fetch_session = requests.Session()
+URL_TEXT_CACHE_TTL = 3600  # seconds
+
+# Size the urllib3 pool so keep-alive connections are reused across fetches
+# instead of paying a TCP+TLS handshake per call
+_fetch_adapter = HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=64,
+    max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=[502, 503, 504]),
+)
+url_fetch_session.mount("http://", _fetch_adapter)
+url_fetch_session.mount("https://", _fetch_adapter)
+
+# Argon2 hashes in C and releases the GIL while hashing, so a login burst
+# does not stall concurrent requests on the same worker
+password_hasher = PasswordHasher(time_cost=2, memory_cost=65536, parallelism=1)
+
+
+def hash_password(password):
+    return password_hasher.hash(password)
+
+
+def verify_password(stored_hash, password):
+    try:
+        return password_hasher.verify(stored_hash, password)
+    except VerifyMismatchError:
+        return False
+    except InvalidHashError:
+        # Legacy werkzeug pbkdf2 hash from before the argon2 switch
+        return check_password_hash(stored_hash, password)
+
 def extract_text_from_url(url):
-    response = requests.get(url)
-    soup = BeautifulSoup(response.text, "html.parser")
-    return " ".join([p.text for p in soup.find_all("p")])
+    # Cache the extracted text keyed by URL rather than the raw response, so
+    # repeat URLs skip the fetch and parse entirely while misses keep the
+    # bounded-memory streaming below
+    url_cache_key = "urltext:" + hashlib.sha256(url.encode()).hexdigest()
+    try:
+        cached_text = redis_client.get(url_cache_key)
+        if cached_text is not None:
+            return cached_text
+    except redis.RedisError as e:
+        logger.warning("URL text cache read failed: %s", e)
+
+    # Stream the body straight into lxml's incremental parser so we never
+    # hold the full document (or its DOM) in memory at once
+    response = url_fetch_session.get(
+        url,
+        stream=True,
+        timeout=(3, 10),
+        headers={"User-Agent": "ChatcatBot/1.0 (+https://chatcat-moo7.onrender.com)"},
+    )
+    response.raw.decode_content = True
+    parts = []
+    for _, element in etree.iterparse(response.raw, tag="p", html=True, recover=True):
+        parts.append("".join(element.itertext()))
+        element.clear()
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+    text = " ".join(parts)
+
+    try:
+        redis_client.set(url_cache_key, text, ex=URL_TEXT_CACHE_TTL)
+    except redis.RedisError as e:
+        logger.warning("URL text cache write failed: %s", e)
+    return text
 
 def generate_integration_code(api_key):
     return f"""
@@ -92,6 +229,12 @@ def generate_integration_code(api_key):
 <script src="https://chatcat-moo7.onrender.com/chatbot.js?api_key={api_key}"></script>
 """
 
+# Read the chatbot script template once at import time; only the API key
+# varies per request, so the handler just splices it between the parts
+with open(os.path.join(app.root_path, "design.txt"), "r") as _script_file:
+    _chatbot_script_parts = _script_file.read().split("{api_key}")
+
+
 @app.route("/chatbot.js", methods=["GET", "POST"])
 def chatbot_script():
     try:
@@ -100,15 +243,16 @@ def chatbot_script():
             app.logger.error("API key not provided in request")
             return jsonify({"error": "API key is required"}), 400
 
-        # Read the script from design.txt
-        script_path = os.path.join(app.root_path, "design.txt")
-        with open(script_path, "r") as file:
-            script = file.read()
+        script = api_key.join(_chatbot_script_parts)
+        etag = hashlib.md5(script.encode()).hexdigest()
+        if request.if_none_match.contains(etag):
+            return Response(status=304)
 
-        # Replace placeholders with actual API key
-        script = script.replace("{api_key}", api_key)
-
-        return Response(script, mimetype="application/javascript")
+        return Response(
+            script,
+            mimetype="application/javascript",
+            headers={"Cache-Control": "public, max-age=3600", "ETag": etag},
+        )
     except Exception as e:
         app.logger.error(f"Error in chatbot_script: {str(e)}")
         return (
@@ -125,29 +269,48 @@ def test_db():
         app.logger.error(f"Database connection error: {str(e)}")
         return f"Database connection failed: {str(e)}"
 
+@functools.lru_cache(maxsize=16)
+def _render_static_page(template_name):
+    return render_template(template_name)
+
+
+def static_page_response(template_name):
+    # These templates have no per-request data, so render each once and let
+    # browsers/CDNs revalidate with the ETag
+    html = _render_static_page(template_name)
+    etag = hashlib.md5(html.encode()).hexdigest()
+    if request.if_none_match.contains(etag):
+        return Response(status=304)
+    return Response(
+        html,
+        mimetype="text/html",
+        headers={"Cache-Control": "public, max-age=600", "ETag": etag},
+    )
+
+
 @app.route("/")
 def home():
-    return render_template("home.html")
+    return static_page_response("home.html")
 
 @app.route("/about")
 def about():
-    return render_template("about.html")
+    return static_page_response("about.html")
 
 @app.route("/documentation")
 def docs():
-    return render_template("documentation.html")
+    return static_page_response("documentation.html")
 
 @app.route("/project")
 def projects():
-    return render_template("products.html")
+    return static_page_response("products.html")
 
 @app.route("/contact")
 def contact():
-    return render_template("contact.html")
+    return static_page_response("contact.html")
 
 @app.route("/privacy")
 def privacy():
-    return render_template("privacy.html")
+    return static_page_response("privacy.html")
 
 @app.route("/auth")
 @app.route("/login")
@@ -227,7 +390,7 @@ def register():
     if User.query.filter_by(email=email).first():
         return jsonify({"error": "Email already registered"}), 400
 
-    hashed_password = generate_password_hash(password)
+    hashed_password = hash_password(password)
     new_user = User(email=email, password=hashed_password)
     db.session.add(new_user)
     db.session.commit()
@@ -243,8 +406,17 @@ def login():
     email = data.get("email")
     password = data.get("password")
 
-    user = User.query.filter_by(email=email).first()
-    if user and check_password_hash(user.password, password):
+    # Fetch only the columns login needs via the indexed email lookup
+    user = db.session.execute(
+        db.select(User)
+        .options(load_only(User.id, User.password))
+        .where(User.email == email)
+    ).scalar_one_or_none()
+    if user and verify_password(user.password, password):
+        if not user.password.startswith("$argon2"):
+            # Upgrade legacy pbkdf2 hashes in place on successful login
+            user.password = hash_password(password)
+            db.session.commit()
         session["user_id"] = user.id
         return jsonify({"message": "Logged in successfully"}), 200
 
@@ -269,7 +441,7 @@ def process_url():
 
     try:
         extracted_text = extract_text_from_url(url)
-        api_key = f"user_{uuid.uuid4().hex}"
+        api_key = "user_" + secrets.token_urlsafe(16)
 
         new_api_key = APIKey(
             key=api_key,
@@ -280,6 +452,8 @@ def process_url():
         db.session.add(new_api_key)
         db.session.commit()
 
+        cache_extracted_text(api_key, extracted_text)
+
         integration_code = generate_integration_code(api_key)
 
         return jsonify(
@@ -291,7 +465,7 @@ def process_url():
             }
         )
     except Exception as e:
-        app.logger.error(f"Error in process_url: {str(e)}", exc_info=True)
+        app.logger.error("Error in process_url: %s", e, exc_info=True)
         return jsonify({"error": str(e)}), 500
 
 def process_ecommerce_response(response):
@@ -316,43 +490,10 @@ def process_ecommerce_response(response):
         # If no product information is found, return the response as is
         return {"response": response}
 
-# Modify the chat route to improve memory handling
-@app.route("/chat", methods=["POST"])
-@limiter.limit("50 per minute")
-def chat():
-    start_time = time.time()
-    try:
-        user_input = request.json.get("input")
-        api_key = request.json.get("api_key")
-
-        if not user_input or not api_key:
-            return jsonify({"error": "Input and API key are required"}), 400
-
-        api_key_data = APIKey.query.filter_by(key=api_key).first()
-        if not api_key_data:
-            return jsonify({"error": "Invalid API key"}), 400
-
-        # Fetch or create conversation
-        conversation = Conversation.query.filter_by(user_id=api_key_data.user_id, api_key_id=api_key_data.id).order_by(Conversation.updated_at.desc()).first()
-        
-        if not conversation or (datetime.utcnow() - conversation.created_at) > timedelta(hours=24):
-            conversation = Conversation(user_id=api_key_data.user_id, api_key_id=api_key_data.id, messages=[])
-            db.session.add(conversation)
-
-        # Append user input to conversation history
-        conversation.messages.append({"role": "user", "content": user_input})
-
-        # Fetch the extracted text associated with this API key
-        context = api_key_data.extracted_text
-
-        # Fetch custom prompts for the user
-        custom_prompts = CustomPrompt.query.filter_by(user_id=api_key_data.user_id).all()
-
-        # Prepare messages for AI, including conversation history and custom prompts
-        messages = [
-            {
-                "role": "system",
-                "content": f"""You are an AI assistant specialized for this website. Use the following content as your knowledge base: {context}
+# Static portion of the /chat system prompt. Built once at import and kept
+# byte-identical across requests — ahead of the per-key context — so any
+# server-side prompt-prefix cache can reuse it
+CHAT_SYSTEM_INSTRUCTIONS = """You are an AI assistant specialized for this website.
 
 Key guidelines:
 1. Provide concise, accurate answers based on the website's content.
@@ -384,26 +525,98 @@ For e-commerce queries:
 - Mention customer reviews or ratings if available, focusing on positive aspects
 - If the user seems close to a purchase decision, guide them on how to add items to their cart or complete the checkout process
 
+If you need more information to answer accurately, ask the user a clarifying question."""
 
-Custom prompts:
-{' '.join([f'- {prompt.prompt}: {prompt.response}' for prompt in custom_prompts])}
+CHAT_CONTEXT_PREFIX = "Use the following content as your knowledge base: "
+CHAT_CUSTOM_PROMPTS_PREFIX = "\n\nCustom prompts:\n"
 
-If you need more information to answer accurately, ask the user a clarifying question.""",
-            }
-        ] + conversation.messages[-5:]  # Include last 5 messages for context
 
-        logger.info(f"Sending request to AI service with input: {user_input}")
+# Modify the chat route to improve memory handling
+@app.route("/chat", methods=["POST"])
+@limiter.limit("50 per minute")
+def chat():
+    start_time = time.time()
+    try:
+        user_input = request.json.get("input")
+        api_key = request.json.get("api_key")
 
-        ai_response = get_ai_response(api_key_data.llm, messages)
+        if not user_input or not api_key:
+            return jsonify({"error": "Input and API key are required"}), 400
 
-        logger.info(f"Received response from AI service: {ai_response}")
+        api_key_data = APIKey.query.filter_by(key=api_key).first()
+        if not api_key_data:
+            return jsonify({"error": "Invalid API key"}), 400
+
+        # Fetch or create conversation
+        conversation = Conversation.query.filter_by(user_id=api_key_data.user_id, api_key_id=api_key_data.id).order_by(Conversation.updated_at.desc()).first()
+        
+        if not conversation or (datetime.utcnow() - conversation.created_at) > timedelta(hours=24):
+            conversation = Conversation(user_id=api_key_data.user_id, api_key_id=api_key_data.id, messages=[])
+            db.session.add(conversation)
+
+        # Append user input to conversation history
+        conversation.messages.append({"role": "user", "content": user_input})
+
+        # Fetch the extracted text for this API key, hitting Redis before the DB
+        context = get_cached_extracted_text(api_key)
+        if context is None:
+            context = api_key_data.extracted_text
+            cache_extracted_text(api_key, context)
+
+        # Fetch custom prompts for the user
+        custom_prompts = CustomPrompt.query.filter_by(user_id=api_key_data.user_id).all()
+
+        # The static instructions go in their own leading system message, kept
+        # byte-identical across every request so Together's server-side prompt
+        # prefix cache can skip re-prefilling it; only the second message varies
+        messages = [
+            {"role": "system", "content": CHAT_SYSTEM_INSTRUCTIONS},
+            {
+                "role": "system",
+                "content": "".join(
+                    [
+                        CHAT_CONTEXT_PREFIX,
+                        context,
+                        CHAT_CUSTOM_PROMPTS_PREFIX,
+                        " ".join(
+                            f"- {prompt.prompt}: {prompt.response}" for prompt in custom_prompts
+                        ),
+                    ]
+                ),
+            },
+        ] + conversation.messages[-5:]  # Include last 5 messages for context
+
+        logger.info("Sending request to AI service with input: %s", user_input)
+
+        # Exact-match response cache: a repeated question against the same key
+        # and model turns a multi-second LLM call into a Redis GET
+        llm_cache_key = "llm:" + hashlib.sha256(
+            f"{api_key_data.llm}|{api_key}|{user_input}".encode()
+        ).hexdigest()
+        ai_response = None
+        try:
+            cached_response = redis_client.get(llm_cache_key)
+            if cached_response:
+                ai_response = orjson.loads(cached_response)
+        except redis.RedisError as e:
+            logger.warning("LLM cache read failed: %s", e)
+
+        if ai_response is None:
+            ai_response = get_ai_response(api_key_data.llm, messages)
+            try:
+                redis_client.set(llm_cache_key, orjson.dumps(ai_response).decode(), ex=3600)
+            except redis.RedisError as e:
+                logger.warning("LLM cache write failed: %s", e)
+
+        logger.info("Received response from AI service: %s", ai_response)
 
         # Append AI response to conversation history
-        conversation.messages.append({"role": "assistant", "content": json.dumps(ai_response)})
+        conversation.messages.append(
+            {"role": "assistant", "content": orjson.dumps(ai_response).decode()}
+        )
         conversation.updated_at = datetime.utcnow()
-        db.session.commit()
 
-        # Record analytics
+        # Record analytics in the same transaction as the conversation update
         end_time = time.time()
         response_time = end_time - start_time
         analytics = Analytics(
@@ -416,12 +629,12 @@ If you need more information to answer accurately, ask the user a clarifying que
         db.session.add(analytics)
         db.session.commit()
         app.logger.info(
-            f"Recorded analytics for user_id: {api_key_data.user_id}, api_key: {api_key}"
+            "Recorded analytics for user_id: %s, api_key: %s", api_key_data.user_id, api_key
         )
 
         return jsonify(ai_response)
     except Exception as e:
-        app.logger.error(f"Error in chat route: {str(e)}", exc_info=True)
+        app.logger.error("Error in chat route: %s", e, exc_info=True)
 
         # Record analytics for error case
         end_time = time.time()
@@ -435,7 +648,7 @@ If you need more information to answer accurately, ask the user a clarifying que
         )
         db.session.add(analytics)
         db.session.commit()
-        app.logger.info(f"Recorded error analytics for api_key: {api_key}")
+        app.logger.info("Recorded error analytics for api_key: %s", api_key)
 
         return jsonify({"error": f"Unexpected error: {str(e)}"}), 500
 
@@ -522,6 +735,8 @@ def get_ai_response(llm_type, messages):
             messages.append({"role": "system", "content": f"Consider this relevant information: {predicted_response}"})
 
     if llm_type == "together":
+        # Blocking call, but gevent's monkey-patched sockets yield the
+        # greenlet for the whole LLM round-trip, so the worker stays free
         response = together_client.chat.completions.create(
             model="meta-llama/Llama-3.2-90B-Vision-Instruct-Turbo",
             messages=messages,
@@ -614,9 +829,12 @@ def get_user_api_keys():
     if "user_id" not in session:
         return jsonify({"error": "User not logged in"}), 401
 
-    user = User.query.get(session["user_id"])
-    api_keys = [{"api_key": key.key, "llm": key.llm} for key in user.api_keys]
-    return jsonify({"api_keys": api_keys})
+    # Project just the two columns we return; loading the full APIKey rows
+    # would drag every extracted_text blob off disk
+    rows = db.session.execute(
+        db.select(APIKey.key, APIKey.llm).where(APIKey.user_id == session["user_id"])
+    ).all()
+    return jsonify({"api_keys": [{"api_key": key, "llm": llm} for key, llm in rows]})
 
 
 # Add this new route to retrieve analytics data
@@ -712,7 +930,7 @@ def update_profile():
 
     if new_password:
         if new_password == confirm_password:
-            user.password = generate_password_hash(new_password)
+            user.password = hash_password(new_password)
             flash("Password updated successfully", "success")
         else:
             flash("Passwords do not match", "error")
@@ -777,7 +995,7 @@ def profile():
             user.email = new_email
 
         if new_password and new_password == confirm_password:
-            user.password = generate_password_hash(new_password)
+            user.password = hash_password(new_password)
         elif new_password and new_password != confirm_password:
             flash("Passwords do not match", "error")
             return redirect(url_for("profile"))
@@ -793,9 +1011,16 @@ def profile():
 @login_required
 def delete_api_key():
     api_key_id = request.form.get("api_key_id")
-    api_key = APIKey.query.get(api_key_id)
-    if api_key and api_key.user_id == session["user_id"]:
-        db.session.delete(api_key)
+    # Fetch just the key string for cache invalidation rather than loading
+    # the whole row (extracted_text can be large)
+    key = db.session.execute(
+        db.select(APIKey.key).where(
+            APIKey.id == api_key_id, APIKey.user_id == session["user_id"]
+        )
+    ).scalar_one_or_none()
+    if key:
+        drop_cached_extracted_text(key)
+        APIKey.query.filter_by(id=api_key_id).delete(synchronize_session=False)
         db.session.commit()
         flash("API key deleted successfully", "success")
     else:
@@ -828,8 +1053,8 @@ def change_password():
     current_password = request.form.get("current_password")
     new_password = request.form.get("new_password")
     user = User.query.get(session["user_id"])
-    if user and check_password_hash(user.password, current_password):
-        user.password = generate_password_hash(new_password)
+    if user and verify_password(user.password, current_password):
+        user.password = hash_password(new_password)
         db.session.commit()
         flash("Password changed successfully", "success")
     else:
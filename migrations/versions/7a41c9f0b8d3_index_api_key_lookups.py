@@ -0,0 +1,29 @@
+"""Index api_key lookups
+
+Revision ID: 7a41c9f0b8d3
+Revises: 05d8b322025a
+Create Date: 2026-09-01 10:02:41.173822
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '7a41c9f0b8d3'
+down_revision = '05d8b322025a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('api_key', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('created_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_api_key_key'), ['key'], unique=False)
+        batch_op.create_index(batch_op.f('ix_api_key_user_id'), ['user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('api_key', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_api_key_user_id'))
+        batch_op.drop_index(batch_op.f('ix_api_key_key'))
+        batch_op.drop_column('created_at')
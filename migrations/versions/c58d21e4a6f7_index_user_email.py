@@ -0,0 +1,25 @@
+"""Index user email
+
+Revision ID: c58d21e4a6f7
+Revises: 7a41c9f0b8d3
+Create Date: 2026-09-01 11:37:05.914268
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c58d21e4a6f7'
+down_revision = '7a41c9f0b8d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_user_email'), ['email'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_user_email'))
@@ -0,0 +1,17 @@
+# Gevent monkey-patching must run before anything imports requests,
+# SQLAlchemy or the stdlib socket machinery, so keep this file import-light.
+# Views must stay plain sync functions: asgiref's AsyncToSync (used by Flask
+# async views) pins an event loop per OS thread, which breaks once greenlets
+# share one thread — concurrency here comes from patched blocking IO instead
+from gevent import monkey
+
+monkey.patch_all()
+
+from psycogreen.gevent import patch_psycopg
+
+patch_psycopg()
+
+from app import app
+
+if __name__ == "__main__":
+    app.run()